@@ -1,6 +1,7 @@
 import copy
 from typing import Any
 
+import torch
 from cyy_naive_lib.log import get_logger
 from cyy_naive_lib.storage import DataStorage
 
@@ -23,19 +24,25 @@ class AggregationAlgorithm:
 
             match d:
                 case dict():
-                    d = {k2: v2 * ratio for (k2, v2) in d.items()}
+                    # Fuse the per-key operations into multi-tensor kernels.
+                    if avg_data is None:
+                        avg_data = dict(
+                            zip(d.keys(), torch._foreach_mul(list(d.values()), ratio))
+                        )
+                    else:
+                        torch._foreach_add_(
+                            list(avg_data.values()),
+                            [d[k2] for k2 in avg_data],
+                            alpha=ratio,
+                        )
                 case _:
                     d = d * ratio
+                    if avg_data is None:
+                        avg_data = d
+                    else:
+                        avg_data += d
             if isinstance(v, DataStorage):
                 v.save()
-            if avg_data is None:
-                avg_data = d
-            else:
-                if isinstance(avg_data, dict):
-                    for k in avg_data:
-                        avg_data[k] += d[k]
-                else:
-                    avg_data += d
         return avg_data
 
     def extract_data(
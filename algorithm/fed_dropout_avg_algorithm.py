@@ -24,6 +24,9 @@ class FedDropoutAvgAlgorithm(AggregationAlgorithm):
             parameter_list[worker_id] = cat_tensors_to_vector(
                 get_mapping_values_by_key_order(data["parameter"])
             )
+            # Workers may send the parameters in bfloat16.
+            if parameter_list[worker_id].dtype == torch.bfloat16:
+                parameter_list[worker_id] = parameter_list[worker_id].float()
             weights[worker_id] = (parameter_list[worker_id] != 0).float() * data[
                 "dataset_size"
             ]
@@ -1,60 +1,163 @@
+import concurrent.futures
+import contextlib
+import functools
+import mmap
 import os
 import re
-
-import torch
+import statistics
 
 from config import global_config as config
 from config import load_config
 
+_NUMBER_BYTES = frozenset(b"0123456789.")
+_TAIL_NUM_RE = re.compile(rb"[0-9.]+$")
+_WORKER_ACC_RE = re.compile(rb"worker (\d+).*train.*accuracy")
+
+
+def _prefetch_logs(paths) -> None:
+    # Ask the kernel to start reading every log asynchronously, so that the
+    # reads of all files overlap instead of each scan waiting for its own.
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+@contextlib.contextmanager
+def _map_log(path):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+
+
+def _iter_lines(mm):
+    # Binary mode has no universal newlines, so strip "\r\n" as well as "\n".
+    mm.seek(0)
+    return (line.rstrip(b"\r\n") for line in iter(mm.readline, b""))
+
+
+def _line_bounds(mm, pos: int) -> tuple[int, int]:
+    start = mm.rfind(b"\n", 0, pos) + 1
+    stop = mm.find(b"\n", pos)
+    if stop == -1:
+        stop = len(mm)
+    # Leave out the "\r" of CRLF line endings.
+    if stop > start and mm[stop - 1] == ord("\r"):
+        stop -= 1
+    return start, stop
+
+
+def _last_line_with(mm, keyword: bytes, *extra_keywords: bytes) -> bytes | None:
+    # Jump between occurrences of the keyword instead of walking every line.
+    end = len(mm)
+    while (pos := mm.rfind(keyword, 0, end)) != -1:
+        start, stop = _line_bounds(mm, pos)
+        line = mm[start:stop]
+        if all(extra_keyword in line for extra_keyword in extra_keywords):
+            return line
+        end = start
+    return None
+
+
+def _gate(*keywords: bytes) -> re.Pattern:
+    return re.compile(b"|".join(re.escape(keyword) for keyword in keywords))
+
+
+def _iter_gated_lines(mm, gate: re.Pattern):
+    # Search the whole mapping in one go and only slice out the lines holding
+    # any of the gate's keywords, each line once. A line may hold several
+    # keywords, so callers still check every keyword they handle.
+    pos = 0
+    while (m := gate.search(mm, pos)) is not None:
+        start, stop = _line_bounds(mm, m.start())
+        yield mm[start:stop]
+        pos = stop + 1
+
+
+def _parse_pct(line: bytes) -> float:
+    # The percentage is the run of digits and dots right before the first "%"
+    # that follows one.
+    end = line.find(b"%")
+    while end != -1 and (end == 0 or line[end - 1] not in _NUMBER_BYTES):
+        end = line.find(b"%", end + 1)
+    if end == -1:
+        raise ValueError(f"no percentage in {line!r}")
+    start = end
+    while start > 0 and line[start - 1] in _NUMBER_BYTES:
+        start -= 1
+    return float(line[start:end])
+
+
+def _parse_tail_number(line: bytes) -> float:
+    # The pattern only admits digits and dots, so the match needs no cleanup.
+    # Being anchored at the end of the line, it can match at most once.
+    return float(_TAIL_NUM_RE.search(line).group())
+
+
+def _std_mean(values: list) -> tuple[float, float]:
+    # The sample standard deviation, as torch.std_mean computes by default.
+    std = statistics.stdev(values) if len(values) > 1 else 0.0
+    return std, statistics.fmean(values)
+
+
+def _scan_path(
+    path: str, test_keywords: tuple, worker_number: int
+) -> tuple[bytes | None, dict]:
+    assert os.path.isfile(path)
+    with _map_log(path) as mm:
+        test_line = _last_line_with(mm, *test_keywords)
+        # One forward pass keeps the last training accuracy of every worker.
+        last_worker_acc: dict = {}
+        for line in _iter_lines(mm):
+            m = _WORKER_ACC_RE.search(line)
+            if m is None:
+                continue
+            worker_id = int(m.group(1))
+            if worker_id >= worker_number:
+                continue
+            last_worker_acc[worker_id] = _parse_pct(line)
+    return test_line, last_worker_acc
+
 
 def compute_acc(paths):
     final_test_acc = []
     worker_acc: dict = {}
-    for path in paths:
-        assert os.path.isfile(path)
-        lines = None
-        with open(path, "rt", encoding="utf8") as f:
-            lines = f.readlines()
-        for line in reversed(lines):
-            if config.distributed_algorithm == "sign_SGD":
-                if "test loss" in line:
-                    res = re.findall("[0-9.]+%", line)
-                    assert len(res) == 1
-                    acc = float(res[0].replace("%", ""))
-                    final_test_acc.append(acc)
-                    break
-            elif config.distributed_algorithm in (
-                "fed_obd_first_stage",
-                "fed_obd_layer",
-            ):
-                if "test accuracy is" in line and "round " + str(config.round) in line:
-                    res = re.findall("[0-9.]+%", line)
-                    assert len(res) == 1
-                    acc = float(res[0].replace("%", ""))
-                    print(line)
-                    final_test_acc.append(acc)
-                    break
-            else:
-                if "test accuracy is" in line:
-                    res = re.findall("[0-9.]+%", line)
-                    assert len(res) == 1
-                    acc = float(res[0].replace("%", ""))
-                    print(line)
-                    final_test_acc.append(acc)
-                    break
-        for worker_id in range(config.worker_number):
-            for line in reversed(lines):
-                res = re.findall(f"worker {worker_id}.*train.*accuracy", line)
-                if res:
-                    res = re.findall("[0-9.]+%", line)
-                    assert len(res) == 1
-                    acc = float(res[0].replace("%", ""))
-                    if worker_id not in worker_acc:
-                        worker_acc[worker_id] = []
-                    worker_acc[worker_id].append(acc)
-                    break
+    if config.distributed_algorithm == "sign_SGD":
+        test_keywords: tuple = (b"test loss",)
+    elif config.distributed_algorithm in (
+        "fed_obd_first_stage",
+        "fed_obd_layer",
+    ):
+        test_keywords = (b"test accuracy is", b"round %d" % config.round)
+    else:
+        test_keywords = (b"test accuracy is",)
+    # The logs are independent, so they are scanned in parallel.
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        for test_line, last_worker_acc in executor.map(
+            functools.partial(
+                _scan_path,
+                test_keywords=test_keywords,
+                worker_number=config.worker_number,
+            ),
+            paths,
+        ):
+            if test_line is not None:
+                acc = _parse_pct(test_line)
+                if config.distributed_algorithm != "sign_SGD":
+                    print(test_line.decode())
+                final_test_acc.append(acc)
+            for worker_id, acc in sorted(last_worker_acc.items()):
+                if worker_id not in worker_acc:
+                    worker_acc[worker_id] = []
+                worker_acc[worker_id].append(acc)
     assert len(final_test_acc) == len(paths)
-    std, mean = torch.std_mean(torch.tensor(final_test_acc))
+    std, mean = _std_mean(final_test_acc)
     print("test acc", mean, std)
 
 
@@ -62,6 +165,7 @@ if __name__ == "__main__":
     load_config()
     paths = os.getenv("logfiles").split(" ")
     assert paths
+    _prefetch_logs(paths)
     compute_acc(paths)
 
     if config.distributed_algorithm.lower() == "fed_obd":
@@ -73,44 +177,43 @@ if __name__ == "__main__":
         print("total_msg is", total_msg)
 
         avg_compression = []
+        gate = _gate(
+            b"broadcast NNABQ compression ratio", b"worker NNABQ compression ratio"
+        )
         for path in paths:
             remain_msg = total_msg
-            lines = None
             compressed_part = 0
             rnd_cnt = 0
-            with open(path, "rt", encoding="utf8") as f:
-                lines = f.readlines()
             stage_one = True
-            for line in lines:
-                if "broadcast NNABQ compression ratio" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    broadcast_ratio = float(res[0].replace("(", "").replace(",", ""))
-                    rnd_cnt += 1
-                    if rnd_cnt <= config.round:
-                        compressed_part += (
-                            broadcast_ratio
-                            * config.algorithm_kwargs["random_client_number"]
-                        )
-                        remain_msg -= config.algorithm_kwargs["random_client_number"]
-                    else:
-                        stage_one = False
-                        compressed_part += broadcast_ratio * config.worker_number
-                        remain_msg -= config.worker_number
-                if "worker NNABQ compression ratio" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    worker_ratio = float(res[0].replace("(", "").replace(",", ""))
-                    if stage_one:
-                        worker_ratio *= 1 - config.algorithm_kwargs["dropout_rate"]
-                    compressed_part += worker_ratio
-                    remain_msg -= 1
+            with _map_log(path) as mm:
+                for line in _iter_gated_lines(mm, gate):
+                    if b"broadcast NNABQ compression ratio" in line:
+                        broadcast_ratio = _parse_tail_number(line)
+                        rnd_cnt += 1
+                        if rnd_cnt <= config.round:
+                            compressed_part += (
+                                broadcast_ratio
+                                * config.algorithm_kwargs["random_client_number"]
+                            )
+                            remain_msg -= config.algorithm_kwargs[
+                                "random_client_number"
+                            ]
+                        else:
+                            stage_one = False
+                            compressed_part += broadcast_ratio * config.worker_number
+                            remain_msg -= config.worker_number
+                    if b"worker NNABQ compression ratio" in line:
+                        worker_ratio = _parse_tail_number(line)
+                        if stage_one:
+                            worker_ratio *= 1 - config.algorithm_kwargs["dropout_rate"]
+                        compressed_part += worker_ratio
+                        remain_msg -= 1
             print("remain_msg is", remain_msg, "path is", path)
             assert remain_msg == config.worker_number
             compressed_part += remain_msg
             avg_compression.append(compressed_part / total_msg)
         assert len(avg_compression) == len(paths)
-        std, mean = torch.std_mean(torch.tensor(avg_compression))
+        std, mean = _std_mean(avg_compression)
         print("compression", mean, std)
         print("communication overhead", total_msg * mean, total_msg * std)
     elif config.distributed_algorithm.lower() == "fed_obd_sq":
@@ -147,25 +250,20 @@ if __name__ == "__main__":
         transfer_number: float = 0
         parameter_number = None
         avg_compression = []
+        gate = _gate(b"send_num", b"total_num")
         for path in paths:
-            lines = None
-            with open(path, "rt", encoding="utf8") as f:
-                lines = f.readlines()
-            for line in lines:
-                if "send_num" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    transfer_number += float(res[0])
-                if "total_num" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    parameter_number = float(res[0])
-                    total_number += float(res[0])
+            with _map_log(path) as mm:
+                for line in _iter_gated_lines(mm, gate):
+                    if b"send_num" in line:
+                        transfer_number += _parse_tail_number(line)
+                    if b"total_num" in line:
+                        parameter_number = _parse_tail_number(line)
+                        total_number += parameter_number
             avg_compression.append(
                 (transfer_number + config.worker_number * parameter_number)
                 / (total_number + config.worker_number * parameter_number)
             )
-        std, mean = torch.std_mean(torch.tensor(avg_compression))
+        std, mean = _std_mean(avg_compression)
         print("compression", mean, std)
     if config.distributed_algorithm.lower() == "afd":
         total_msg = (
@@ -178,26 +276,21 @@ if __name__ == "__main__":
         transfer_number = 0
         parameter_number = None
         avg_compression = []
+        gate = _gate(b"send_num", b"parameter number is")
         for path in paths:
-            lines = None
-            with open(path, "rt", encoding="utf8") as f:
-                lines = f.readlines()
-            for line in lines:
-                if "send_num" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    transfer_number += float(res[0])
-                    assert parameter_number is not None
-                    total_number += parameter_number
-                if "parameter number is" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    parameter_number = float(res[0])
+            with _map_log(path) as mm:
+                for line in _iter_gated_lines(mm, gate):
+                    if b"send_num" in line:
+                        transfer_number += _parse_tail_number(line)
+                        assert parameter_number is not None
+                        total_number += parameter_number
+                    if b"parameter number is" in line:
+                        parameter_number = _parse_tail_number(line)
             avg_compression.append(
                 (transfer_number + config.worker_number * parameter_number)
                 / (total_number + config.worker_number * parameter_number)
             )
-        std, mean = torch.std_mean(torch.tensor(avg_compression))
+        std, mean = _std_mean(avg_compression)
         print("compression", mean, std)
 
     if config.distributed_algorithm.lower() == "fed_obd_first_stage":
@@ -209,39 +302,40 @@ if __name__ == "__main__":
         print("total_msg is", total_msg)
 
         avg_compression = []
+        gate = _gate(
+            b"switch",
+            b"broadcast NNABQ compression ratio",
+            b"worker NNABQ compression ratio",
+        )
         for path in paths:
             remain_msg = total_msg
-            lines = None
             compressed_part = 0
             rnd_cnt = 0
-            with open(path, "rt", encoding="utf8") as f:
-                lines = f.readlines()
-            for line in lines:
-                if "switch" in line:
-                    break
-                if "broadcast NNABQ compression ratio" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    broadcast_ratio = float(res[0].replace("(", "").replace(",", ""))
-                    rnd_cnt += 1
-                    if rnd_cnt <= config.round:
-                        compressed_part += (
-                            broadcast_ratio
-                            * config.algorithm_kwargs["random_client_number"]
-                        )
-                        remain_msg -= config.algorithm_kwargs["random_client_number"]
-                if "worker NNABQ compression ratio" in line:
-                    res = re.findall("[0-9.]+$", line)
-                    assert len(res) == 1
-                    worker_ratio = float(res[0].replace("(", "").replace(",", ""))
-                    worker_ratio *= 1 - config.algorithm_kwargs["dropout_rate"]
-                    compressed_part += worker_ratio
-                    remain_msg -= 1
+            with _map_log(path) as mm:
+                for line in _iter_gated_lines(mm, gate):
+                    if b"switch" in line:
+                        break
+                    if b"broadcast NNABQ compression ratio" in line:
+                        broadcast_ratio = _parse_tail_number(line)
+                        rnd_cnt += 1
+                        if rnd_cnt <= config.round:
+                            compressed_part += (
+                                broadcast_ratio
+                                * config.algorithm_kwargs["random_client_number"]
+                            )
+                            remain_msg -= config.algorithm_kwargs[
+                                "random_client_number"
+                            ]
+                    if b"worker NNABQ compression ratio" in line:
+                        worker_ratio = _parse_tail_number(line)
+                        worker_ratio *= 1 - config.algorithm_kwargs["dropout_rate"]
+                        compressed_part += worker_ratio
+                        remain_msg -= 1
             assert remain_msg == config.worker_number
             # print("remain_msg is", remain_msg, "path is", path)
             compressed_part += remain_msg
             avg_compression.append(compressed_part / total_msg)
         assert len(avg_compression) == len(paths)
-        std, mean = torch.std_mean(torch.tensor(avg_compression))
+        std, mean = _std_mean(avg_compression)
         print("compression", mean, std)
         print("co", mean * total_msg, std * total_msg)
@@ -26,6 +26,10 @@ class AggregationServer(Server, ModelCache):
     def round_number(self):
         return self._round_number
 
+    @property
+    def algorithm(self):
+        return self.__algorithm
+
     def _distribute_init_model(self):
         if self.config.distribute_init_parameters:
             if self.__init_global_model_path is not None:
@@ -15,6 +15,9 @@ class MultiRoundShapleyValueServer(FedAVGServer):
         self.choose_best_subset: bool = self.config.algorithm_kwargs.get(
             "choose_best_subset", False
         )
+        self.__subset_metrics: dict[frozenset, float] = {}
+        self.__weighted_parameters: dict = {}
+        self.__dataset_sizes: dict = {}
 
     def _aggregate_worker_data(self, worker_data):
         if self.sv_algorithm is None:
@@ -24,10 +27,15 @@ class MultiRoundShapleyValueServer(FedAVGServer):
                     self.metric_type
                 ],
             )
+        # The worker data changes every round, so do the cached metrics.
+        self.__subset_metrics = {}
+        self.__prepare_subset_aggregation(worker_data)
         self.sv_algorithm.set_metric_function(
             functools.partial(self._get_subset_metric, worker_data=worker_data)
         )
         self.sv_algorithm.compute()
+        self.__weighted_parameters = {}
+        self.__dataset_sizes = {}
         if self.choose_best_subset:
             best_subset: set = set(
                 self.sv_algorithm.shapley_values_S[self.sv_algorithm.round_number].keys()
@@ -38,9 +46,37 @@ class MultiRoundShapleyValueServer(FedAVGServer):
 
         return super()._aggregate_worker_data(worker_data)
 
+    def __prepare_subset_aggregation(self, worker_data) -> None:
+        # Weight every worker's parameters by its dataset size once, so that the
+        # average of a subset is a sum over its members divided by their sizes.
+        full_worker_data = self.algorithm.extract_data(
+            worker_data=worker_data, old_parameter_dict=self.cached_parameter_dict
+        )
+        self.__dataset_sizes = full_worker_data["dataset_size"]
+        self.__weighted_parameters = {
+            worker_id: {
+                k: v * self.__dataset_sizes[worker_id] for k, v in parameter.items()
+            }
+            for worker_id, parameter in full_worker_data["parameter"].items()
+        }
+
     def _get_subset_metric(self, _, subset, worker_data):
-        worker_data = {k: v for k, v in worker_data.items() if k in subset}
-        assert worker_data
-        return self.get_metric(super()._aggregate_worker_data(worker_data))[
-            self.metric_type
-        ]
+        key = frozenset(subset)
+        metric = self.__subset_metrics.get(key, None)
+        if metric is not None:
+            return metric
+        worker_ids = [k for k in worker_data if k in subset]
+        assert worker_ids
+        total_size = sum(self.__dataset_sizes[worker_id] for worker_id in worker_ids)
+        parameter_dict: dict = {}
+        for worker_id in worker_ids:
+            for k, v in self.__weighted_parameters[worker_id].items():
+                if k in parameter_dict:
+                    parameter_dict[k] += v
+                else:
+                    parameter_dict[k] = v.clone()
+        for k in parameter_dict:
+            parameter_dict[k] /= total_size
+        metric = self.get_metric(parameter_dict)[self.metric_type]
+        self.__subset_metrics[key] = metric
+        return metric
@@ -90,7 +90,10 @@ def train(
     worker_config = get_worker_config(config, practitioner_ids=practitioner_ids)
     # Topology is something similar to list of multi-processing queue
     topology = worker_config.pop("topology")
-    device_lock = multiprocessing.Manager().RLock()
+    # A SemLock-backed RLock avoids a manager process and IPC on every acquire.
+    # It comes from a spawn context so that the pool initializer can pass it to
+    # spawned workers.
+    device_lock = multiprocessing.get_context("spawn").RLock()
     task_id: int | None = None
     if non_blocking:
         task_id = uuid.uuid4().int
@@ -10,18 +10,32 @@ class FedDropoutAvgWorker(FedAVGWorker):
         super().__init__(**kwargs)
         self.__dropout_rate: float = self.config.algorithm_kwargs["dropout_rate"]
         get_logger().error("use dropout_rate %s", self.__dropout_rate)
+        # Sending in bfloat16 halves the traffic but is lossy, so it is opt-in.
+        self.__send_in_bfloat16: bool = self.config.algorithm_kwargs.get(
+            "send_in_bfloat16", False
+        )
+        # The model shape doesn't change between rounds.
+        self.__total_num: int | None = None
 
     def _get_sent_data(self) -> dict:
         self._send_parameter_diff = False
         sent_data = super()._get_sent_data()
         parameter = sent_data["parameter"]
-        total_num = 0
-        send_num = 0
+        keep_rate = 1 - self.__dropout_rate
+        if self.__total_num is None:
+            self.__total_num = sum(v.numel() for v in parameter.values())
+        # Accumulate on the device so that there is only one synchronization.
+        send_num: torch.Tensor | int = 0
         for k, v in parameter.items():
-            weight = torch.bernoulli(torch.full_like(v, 1 - self.__dropout_rate))
-            parameter[k] = v * weight
-            total_num += parameter[k].numel()
-            send_num += torch.count_nonzero(parameter[k]).item()
+            # A boolean mask takes one byte per element. The parameters may share
+            # storage with the model, so they are not masked in place.
+            mask = torch.empty_like(v, dtype=torch.bool).bernoulli_(keep_rate)
+            parameter[k] = v * mask
+            # Zeros are treated as dropped by the server, so count the non-zeros.
+            send_num += torch.count_nonzero(parameter[k])
+            if self.__send_in_bfloat16 and v.is_floating_point():
+                parameter[k] = parameter[k].to(dtype=torch.bfloat16)
+        send_num = int(send_num)
         get_logger().error("send_num %s", send_num)
-        get_logger().error("total_num %s", total_num)
+        get_logger().error("total_num %s", self.__total_num)
         return sent_data